@@ -0,0 +1,153 @@
+import contextlib
+import hashlib
+import os
+
+from PySide6.QtCore import QStandardPaths, QByteArray, QBuffer, QIODevice
+from PySide6.QtGui import QIcon, QPixmap, QPixmapCache
+from loguru import logger
+
+
+class FaviconCache:
+    """Persists page icons on disk so tab buttons have an icon before the page loads."""
+
+    ICON_SIZE = 32
+    MAX_CACHE_BYTES = 10 * 1024 * 1024
+
+    # Resolved and created on first use
+    _dir: str | None = None
+    # Set when the cache directory can't be created, icons are then not cached at all
+    _disabled = False
+    # Names of the cached icon files, filled by a single directory scan
+    _index: set[str] | None = None
+
+    @classmethod
+    def _cache_dir(cls) -> str | None:
+        """Returns the cache directory, or None if it can't be created."""
+        if cls._dir is None and not cls._disabled:
+            path = os.path.join(
+                QStandardPaths.writableLocation(
+                    QStandardPaths.StandardLocation.GenericCacheLocation
+                ),
+                "KioskBrowser",
+                "favicons",
+            )
+            try:
+                os.makedirs(path, exist_ok=True)
+            except OSError as e:
+                logger.warning("Failed to create favicon cache {}: {}", path, e)
+                cls._disabled = True
+                return None
+            cls._dir = path
+        return cls._dir
+
+    @classmethod
+    def _cached_files(cls) -> set[str]:
+        if cls._index is None:
+            cls._index = set()
+            cache_dir = cls._cache_dir()
+            if cache_dir is None:
+                return cls._index
+            files = []
+            try:
+                with os.scandir(cache_dir) as entries:
+                    for entry in entries:
+                        try:
+                            # Left over from a write that didn't finish, never a valid icon
+                            if entry.name.endswith(".tmp"):
+                                os.remove(entry.path)
+                            elif entry.is_file():
+                                files.append((entry.name, entry.stat()))
+                        except OSError as e:
+                            logger.warning("Failed to read cached icon {}: {}", entry.name, e)
+            except OSError as e:
+                logger.warning("Failed to scan favicon cache {}: {}", cache_dir, e)
+                return cls._index
+            cls._index = {name for name, _ in files}
+            cls._evict(files)
+        return cls._index
+
+    @classmethod
+    def _evict(cls, files: list[tuple[str, os.stat_result]]) -> None:
+        """Delete the least recently written icons until the cache fits its size limit.
+
+        Icons are rewritten every time their page loads, so mtime tracks last use.
+        """
+        total = sum(stat.st_size for _, stat in files)
+        for name, stat in sorted(files, key=lambda file: file[1].st_mtime):
+            if total <= cls.MAX_CACHE_BYTES:
+                break
+            try:
+                os.remove(os.path.join(cls._cache_dir(), name))
+            except OSError as e:
+                logger.warning("Failed to evict cached icon {}: {}", name, e)
+                continue
+            total -= stat.st_size
+            cls._index.discard(name)
+
+    @staticmethod
+    def _filename(url: str) -> str:
+        """Cache file name for a url, hashed to avoid collisions between similar urls."""
+        return f"{hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()}.png"
+
+    @staticmethod
+    def _pixmap_key(filename: str) -> str:
+        return f"favicon:{filename}"
+
+    @classmethod
+    def get(cls, url: str) -> QIcon | None:
+        """Returns the cached icon for the url, or None if it was never cached."""
+        filename = cls._filename(url)
+        if filename not in cls._cached_files():
+            return None
+
+        # Decoded pixmaps are kept in Qt's LRU pixmap cache so rebuilds don't decode again
+        pixmap = QPixmapCache.find(cls._pixmap_key(filename))
+        if pixmap is None:
+            pixmap = QPixmap(os.path.join(cls._cache_dir(), filename))
+            if pixmap.isNull():
+                return None
+            QPixmapCache.insert(cls._pixmap_key(filename), pixmap)
+        return QIcon(pixmap)
+
+    @classmethod
+    def put(cls, url: str, icon: QIcon) -> None:
+        """Stores the page icon for the url."""
+        cache_dir = cls._cache_dir()
+        if cache_dir is None:
+            return
+        filename = cls._filename(url)
+
+        pixmap = icon.pixmap(cls.ICON_SIZE, cls.ICON_SIZE)
+        QPixmapCache.insert(cls._pixmap_key(filename), pixmap)
+
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        if not pixmap.save(buffer, "PNG"):
+            logger.warning("Failed to cache page icon for {}", url)
+            return
+        png = data.data()
+        path = os.path.join(cache_dir, filename)
+
+        # Most page loads report the same icon, only touch the file to keep it fresh
+        if filename in cls._cached_files():
+            try:
+                with open(path, "rb") as f:
+                    if f.read() == png:
+                        os.utime(path)
+                        return
+            except OSError:
+                pass
+
+        # Write to a temporary file first so a crash never leaves a truncated icon
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to cache page icon for {}: {}", url, e)
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            return
+        cls._cached_files().add(filename)
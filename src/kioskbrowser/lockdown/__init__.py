@@ -1,13 +1,15 @@
 import platform
 
+_IS_WINDOWS = platform.system() == "Windows"
+
 
 def lockdown(options: dict):
-    if platform.system() == "Windows":
+    if _IS_WINDOWS:
         from kioskbrowser.lockdown.winapi import windows_api_hide_taskbar
         if options.get("lockdown_windows_hide_taskbar", False):
             windows_api_hide_taskbar()
 
 def unlock():
-    if platform.system() == "Windows":
+    if _IS_WINDOWS:
         from kioskbrowser.lockdown.winapi import windows_api_show_taskbar
         windows_api_show_taskbar()
@@ -1,18 +1,47 @@
 import ctypes
+from ctypes import wintypes
+from functools import lru_cache
 
 SW_HIDE = 0
 SW_SHOW = 5
 
 FindWindow = ctypes.windll.user32.FindWindowW
+FindWindow.argtypes = (wintypes.LPCWSTR, wintypes.LPCWSTR)
+FindWindow.restype = wintypes.HWND
+
 ShowWindow = ctypes.windll.user32.ShowWindow
+ShowWindow.argtypes = (wintypes.HWND, ctypes.c_int)
+ShowWindow.restype = wintypes.BOOL
+
+IsWindow = ctypes.windll.user32.IsWindow
+IsWindow.argtypes = (wintypes.HWND,)
+IsWindow.restype = wintypes.BOOL
+
+
+@lru_cache(maxsize=None)
+def _find_window(class_name: str):
+    return FindWindow(class_name, None)
+
+
+def _window(class_name: str):
+    """Cached handle of the window, looked up again if the shell wasn't ready or restarted."""
+    handle = _find_window(class_name)
+    if not handle or not IsWindow(handle):
+        _find_window.cache_clear()
+        handle = _find_window(class_name)
+    return handle
+
+
+def _show(class_name: str, command: int):
+    handle = _window(class_name)
+    if handle:
+        ShowWindow(handle, command)
 
-taskbar = FindWindow("Shell_TrayWnd", None)
-Start = FindWindow("Button", None)
 
 def windows_api_hide_taskbar():
-    ShowWindow(taskbar, SW_HIDE)
-    ShowWindow(Start, SW_HIDE)
+    _show("Shell_TrayWnd", SW_HIDE)
+    _show("Button", SW_HIDE)
 
 def windows_api_show_taskbar():
-    ShowWindow(taskbar, SW_SHOW)
-    ShowWindow(Start, SW_SHOW)
+    _show("Shell_TrayWnd", SW_SHOW)
+    _show("Button", SW_SHOW)
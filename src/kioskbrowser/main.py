@@ -2,6 +2,8 @@ from loguru import logger
 import sys
 import os
 import platform
+from functools import lru_cache, partial
+from typing import Any, Mapping
 
 from PySide6.QtWidgets import (
     QApplication,
@@ -19,24 +21,38 @@ from PySide6.QtCore import (
     QSize,
     Qt,
     QTimer,
-    QFile,
-    QIODevice,
+    QTime,
+    QElapsedTimer,
+    QThreadPool,
+    QResource,
+    QEvent,
 )
 from PySide6.QtGui import (
     QIcon,
     QKeySequence,
     QShortcut,
     QPixmap,
+    QPixmapCache,
     QPalette,
     QColor,
 )
 from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage
+from PySide6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage, QWebEngineSettings
 
 from qtawesome import icon as qta_icon
 
-from kioskbrowser.topbar import TopBarIconItem, get_battery, get_time_string, get_cpu, get_mem
+from kioskbrowser.topbar import (
+    TopBarIconItem,
+    TopBarStats,
+    TopBarStatsWorker,
+    get_topbar_snapshot,
+    get_time_string,
+    format_battery,
+    format_cpu,
+    format_mem,
+)
 from kioskbrowser.settings import KioskBrowserSettings, SettingsPage
+from kioskbrowser.favicons import FaviconCache
 
 from kioskbrowser.resources import qInitResources
 from kioskbrowser.lockdown import lockdown, unlock
@@ -44,6 +60,34 @@ import atexit
 
 VERSION = "1.0.0"
 
+
+def _load_stylesheet() -> str:
+    """Read the application stylesheet from resources."""
+    resource = QResource(":/styles/style.qss")
+    if not resource.isValid():
+        logger.warning("Stylesheet resource not found")
+        return ""
+    # The resource is stored compressed, read it straight from the resource data
+    return bytes(resource.uncompressedData()).decode("utf-8")
+
+
+def _welcome_pixmap() -> QPixmap:
+    """Scaled application icon for the welcome page, kept in the pixmap cache across rebuilds."""
+    pixmap = QPixmapCache.find("welcome_icon@512")
+    if pixmap is None:
+        pixmap = QPixmap(":/images/icon.png").scaled(
+            512, 512, mode=Qt.TransformationMode.SmoothTransformation
+        )
+        QPixmapCache.insert("welcome_icon@512", pixmap)
+    return pixmap
+
+
+@lru_cache(maxsize=1)
+def _default_web_icon() -> QIcon:
+    """Fallback icon shared by all tab buttons without a page icon."""
+    return qta_icon("mdi6.web")
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -68,8 +112,11 @@ class MainWindow(QMainWindow):
         self.main_layout.setContentsMargins(0, 0, 0, 0)
         self.main_widget.setLayout(self.main_layout)
 
+        topbar_on = self.settings.get("topbar", True)
+        self._twelve_hour = self.settings.get("topbar_12hr", True)
+
         self.top_bar_widget = QWidget()
-        self.top_bar_widget.setVisible(self.settings.get("topbar", True))
+        self.top_bar_widget.setVisible(topbar_on)
         self.main_layout.addWidget(self.top_bar_widget)
 
         self.top_bar_layout = QHBoxLayout()
@@ -79,31 +126,29 @@ class MainWindow(QMainWindow):
         # Top Bar Items
         self.top_bar_layout.addStretch()
 
-        self.top_bar_mem = TopBarIconItem(*get_mem())
+        snapshot = get_topbar_snapshot()
+
+        self.top_bar_mem = TopBarIconItem(*format_mem(snapshot["mem"]))
         self.top_bar_mem.setObjectName("MemWidget")
         self.top_bar_mem.setVisible(self.settings.get("topbar_mem", False))
         self.top_bar_layout.addWidget(self.top_bar_mem)
 
-        self.top_bar_cpu = TopBarIconItem(*get_cpu())
+        self.top_bar_cpu = TopBarIconItem(*format_cpu(snapshot["cpu"]))
         self.top_bar_cpu.setObjectName("CpuWidget")
         self.top_bar_cpu.setVisible(self.settings.get("topbar_cpu", False))
         self.top_bar_layout.addWidget(self.top_bar_cpu)
 
-        self.top_bar_battery = TopBarIconItem(*get_battery())
+        self.top_bar_battery = TopBarIconItem(*format_battery(snapshot["battery"]))
         self.top_bar_battery.setObjectName("BatteryWidget")
         self.top_bar_battery.setVisible(self.settings.get("topbar_battery", False))
         self.top_bar_layout.addWidget(self.top_bar_battery)
 
-        self.top_bar_clock = QLabel(
-            get_time_string(self.settings.get("topbar_12hr", True))
-        )
+        self.top_bar_clock = QLabel(get_time_string(self._twelve_hour))
         self.top_bar_clock.setObjectName("ClockWidget")
         self.top_bar_layout.addWidget(self.top_bar_clock)
 
         self.pages_layout = QHBoxLayout()
-        self.pages_layout.setContentsMargins(
-            3, 0 if self.settings.get("topbar", True) else 3, 3, 0
-        )
+        self.pages_layout.setContentsMargins(3, 0 if topbar_on else 3, 3, 0)
         self.main_layout.addLayout(self.pages_layout)
 
         self.web_stack = QStackedWidget()
@@ -140,161 +185,355 @@ class MainWindow(QMainWindow):
         self.shared_profile.setPersistentCookiesPolicy(
             QWebEngineProfile.PersistentCookiesPolicy.AllowPersistentCookies
         )
-        logger.info(f"Storage path: {self.shared_profile.persistentStoragePath()}")
-        logger.info(f"Cache path: {self.shared_profile.cachePath()}")
+        # Keep page resources on disk so restarts don't refetch everything
+        self.shared_profile.setHttpCacheType(
+            QWebEngineProfile.HttpCacheType.DiskHttpCache
+        )
+        # Kept small, kiosks often run from SD cards
+        self.shared_profile.setHttpCacheMaximumSize(64 * 1024 * 1024)
+        self.shared_profile.settings().setAttribute(
+            QWebEngineSettings.WebAttribute.LocalStorageEnabled, True
+        )
+        logger.info("Storage path: {}", self.shared_profile.persistentStoragePath())
+        logger.info("Cache path: {}", self.shared_profile.cachePath())
 
         self.web_stack.setFocus()
 
+        # Web views that have been created, kept across rebuilds so unchanged pages don't reload
+        self._view_by_url: dict[str, QWebEngineView] = {}
+
         # Initial page setup
         self._setup_pages()
         self._setup_shortcuts()
-        self._apply_styling()
+
+        # Stats are sampled on the thread pool and applied when they arrive
+        self.top_bar_stats = TopBarStats(self)
+        self.top_bar_stats.sampled.connect(self._apply_topbar_stats)
+        self._stats_busy = False
+        self._stats_on = False
+        # Measures how long a sample took, so the next one still starts on schedule
+        self._stats_elapsed = QElapsedTimer()
+
+        # Last displayed values, widgets are only touched when these change
+        self._last_clock = self.top_bar_clock.text()
+        self._last_battery = self._last_cpu = self._last_mem = None
 
         # Timers
-        self.clock_timer = QTimer()
-        self.clock_timer.setInterval(self.settings.get("topbar_update_speed", 1000))
-        self.clock_timer.timeout.connect(self.topbar_update)
-        self.clock_timer.start()
+        # The clock text only changes once a minute, it is woken up on minute boundaries
+        self.clock_timer = QTimer(self)
+        self.clock_timer.setSingleShot(True)
+        self.clock_timer.timeout.connect(self._tick_clock)
+
+        # Rescheduled after every sample instead of firing on a fixed interval
+        self.stats_timer = QTimer(self)
+        self.stats_timer.setSingleShot(True)
+        self.stats_timer.timeout.connect(self.topbar_update)
+        self._update_topbar_timers()
+
+    def _update_topbar_timers(self):
+        """Only keep the top bar timers running while they have something to update."""
+        topbar_on = self.settings.get("topbar", True)
+        self._stats_on = topbar_on and any(
+            self.settings.get(key, False)
+            for key in ("topbar_battery", "topbar_cpu", "topbar_mem")
+        )
+        self._stats_interval = self.settings.get("topbar_update_speed", 1000)
+
+        if not self._stats_on:
+            self.stats_timer.stop()
+        # A running sample schedules the next one itself
+        elif not self.stats_timer.isActive() and not self._stats_busy:
+            self.stats_timer.start(self._stats_interval)
+
+        if not topbar_on:
+            self.clock_timer.stop()
+        elif not self.clock_timer.isActive():
+            self._schedule_clock()
+
+    def _schedule_clock(self):
+        msecs = QTime.currentTime().msecsSinceStartOfDay()
+        # Slightly past the boundary so the new minute is always read
+        self.clock_timer.start(60_000 - msecs % 60_000 + 50)
+
+    def _tick_clock(self):
+        self._update_clock()
+        self._schedule_clock()
+
+    def _update_clock(self):
+        if not self.top_bar_widget.isVisible():
+            return
+
+        clock = get_time_string(self._twelve_hour)
+        if clock != self._last_clock:
+            self._last_clock = clock
+            self.top_bar_clock.setText(clock)
 
     def topbar_update(self):
-        self.top_bar_clock.setText(
-            get_time_string(self.settings.get("topbar_12hr", True))
+        # Nothing of the top bar is visible while it is hidden or the settings pane is open
+        if not self.top_bar_widget.isVisible():
+            self.stats_timer.start(self._stats_interval)
+            return
+
+        if self._stats_busy:
+            return
+        self._stats_busy = True
+        self._stats_elapsed.start()
+        # Hidden items are not sampled
+        QThreadPool.globalInstance().start(
+            TopBarStatsWorker(
+                self.top_bar_stats,
+                battery=self.top_bar_battery.isVisible(),
+                cpu=self.top_bar_cpu.isVisible(),
+                mem=self.top_bar_mem.isVisible(),
+            )
         )
-        self.top_bar_battery.modify(*get_battery())
-        self.top_bar_cpu.modify(*get_cpu())
-        self.top_bar_mem.modify(*get_mem())
+
+    def _apply_topbar_stats(self, sample: dict):
+        self._stats_busy = False
+
+        try:
+            # Compare what is displayed, the raw samples change on nearly every tick
+            if "battery" in sample:
+                battery = sample["battery"]
+                battery_state = (
+                    (round(battery.percent), battery.power_plugged) if battery else None
+                )
+                if battery_state != self._last_battery:
+                    self._last_battery = battery_state
+                    self.top_bar_battery.modify(*format_battery(battery))
+            if "cpu" in sample and round(sample["cpu"]) != self._last_cpu:
+                self._last_cpu = round(sample["cpu"])
+                self.top_bar_cpu.modify(*format_cpu(sample["cpu"]))
+            if "mem" in sample and round(sample["mem"]) != self._last_mem:
+                self._last_mem = round(sample["mem"])
+                self.top_bar_mem.modify(*format_mem(sample["mem"]))
+        finally:
+            # Time spent sampling counts towards the interval, with a floor for slow machines
+            if self._stats_on:
+                self.stats_timer.start(
+                    max(100, self._stats_interval - self._stats_elapsed.elapsed())
+                )
 
     def exit_settings(self):
         self.root_stack.setCurrentIndex(0)
+        # Minute ticks are skipped while the settings pane is open
+        self._update_clock()
         self.settings_pane.save()
 
     def set_fullscreen(self, fs: bool):
+        # Called on every settings rebuild, only talk to the window manager if the state differs
         if fs:
-            self.showFullScreen()
+            if not self.isFullScreen() or not self.isVisible():
+                self.showFullScreen()
         else:
             if self.isFullScreen():
                 self.showNormal()
-            self.show()
+            if not self.isVisible():
+                self.show()
 
     def _setup_pages(self):
-        # Clear existing pages and buttons
-        while self.web_stack.count():
-            self.web_stack.removeWidget(self.web_stack.widget(0))
-
-        # Clear existing buttons
-        for i in reversed(range(self.pages_layout.count())):
-            widget = self.pages_layout.itemAt(i).widget()
-            self.pages_layout.removeWidget(widget)
-            widget.deleteLater()
-
-        if len(self.settings["urls"]) == 0:
-            # no pages
-            button = QPushButton()
-            button.clicked.connect(lambda: self._switch_page(0))
-            button.setText("KioskBrowser")
-            button.setSizePolicy(
-                QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred
-            )
-            button.setFocusPolicy(Qt.FocusPolicy.TabFocus)
-            button.setObjectName("WebTab")
-            self.pages_layout.addWidget(button)
-
-            no_page_widget = QWidget()
-            no_page_layout = QVBoxLayout(no_page_widget)
-
-            no_page_icon = QLabel()
-            no_page_icon.setPixmap(
-                QPixmap(":/images/icon.png").scaled(
-                    512, 512, mode=Qt.TransformationMode.SmoothTransformation
+        self._pending_icons: list[tuple[QPushButton, str]] = []
+        # Tabs whose web view has not been created yet: index -> (button, url)
+        self._pending_pages: dict[int, tuple[QPushButton, str]] = {}
+        self._tab_buttons: list[QPushButton] = []
+        old_views = self._view_by_url
+        self._view_by_url = {}
+
+        # Hold repaints until every tab is added so the layout is only redone once
+        self.setUpdatesEnabled(False)
+        try:
+            # Clear existing pages, removed web views must be deleted to end their renderers
+            kept_views = set(old_views.values())
+            for i in reversed(range(self.web_stack.count())):
+                widget = self.web_stack.widget(i)
+                self.web_stack.removeWidget(widget)
+                if widget not in kept_views:
+                    widget.deleteLater()
+
+            # Clear existing buttons
+            while (item := self.pages_layout.takeAt(0)) is not None:
+                if item.widget() is not None:
+                    item.widget().deleteLater()
+
+            if len(self.settings["urls"]) == 0:
+                # no pages
+                button = QPushButton()
+                button.clicked.connect(partial(self._switch_page, 0))
+                button.setText("KioskBrowser")
+                button.setSizePolicy(
+                    QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred
                 )
-            )
-            no_page_icon.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            no_page_layout.addWidget(no_page_icon)
+                button.setFocusPolicy(Qt.FocusPolicy.TabFocus)
+                button.setObjectName("WebTab")
+                self.pages_layout.addWidget(button)
 
-            no_page_text = QLabel(
-                "Welcome to KioskBrowser\nUse Shift+F1 to open settings and add pages"
-            )
-            no_page_text.setObjectName("NoPagesText")
-            no_page_text.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            no_page_layout.addWidget(no_page_text)
-
-            self.web_stack.addWidget(no_page_widget)
-
-        # Create new pages and buttons
-        for index, (url, label, icon_path) in enumerate(self.settings["urls"]):
-            button = QPushButton()
-            button.clicked.connect(lambda _, idx=index: self._switch_page(idx))
-            button.setText(label)
-            button.setIconSize(QSize(16, 16))
-            button.setSizePolicy(
-                QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred
-            )
-            button.setFocusPolicy(Qt.FocusPolicy.TabFocus)
-            button.setObjectName("WebTab")
-            self.pages_layout.addWidget(button)
-
-            # Set up the web engine page
-            web_page = QWebEngineView()
-            page = QWebEnginePage(self.shared_profile, web_page)
-            web_page.setPage(page)
-            page.iconChanged.connect(
-                lambda icon, b=button, l=label: self._update_button_icon(b, icon, l)
-            )
-            button.setIcon(qta_icon("mdi6.web"))  # Default icon
+                no_page_widget = QWidget()
+                no_page_layout = QVBoxLayout(no_page_widget)
 
-            page.load(QUrl(url))
+                no_page_icon = QLabel()
+                no_page_icon.setPixmap(_welcome_pixmap())
+                no_page_icon.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                no_page_layout.addWidget(no_page_icon)
 
-            # Add to the widget stack
-            self.web_stack.addWidget(web_page)
+                no_page_text = QLabel(
+                    "Welcome to KioskBrowser\nUse Shift+F1 to open settings and add pages"
+                )
+                no_page_text.setObjectName("NoPagesText")
+                no_page_text.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                no_page_layout.addWidget(no_page_text)
+
+                self.web_stack.addWidget(no_page_widget)
+
+            # Create new pages and buttons
+            for index, (url, label, icon_path) in enumerate(self.settings["urls"]):
+                button = QPushButton()
+                button.clicked.connect(partial(self._switch_page, index))
+                button.setText(label)
+                button.setIconSize(QSize(16, 16))
+                button.setSizePolicy(
+                    QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred
+                )
+                button.setFocusPolicy(Qt.FocusPolicy.TabFocus)
+                button.setObjectName("WebTab")
+                self.pages_layout.addWidget(button)
+                self._tab_buttons.append(button)
+
+                view = old_views.pop(url, None)
+                if view is not None:
+                    # Page is still configured, move its live view over to the new tab
+                    self._view_by_url[url] = view
+                    view.page().iconChanged.disconnect()
+                    view.page().iconChanged.connect(
+                        partial(self._update_button_icon, button, url=url)
+                    )
+                    button.setIcon(
+                        view.icon() if not view.icon().isNull() else _default_web_icon()
+                    )
+                    self.web_stack.addWidget(view)
+                    continue
+
+                button.setIcon(_default_web_icon())
+                self._pending_icons.append((button, url))
+
+                # The web view is only created once the tab is first shown
+                self._pending_pages[index] = (button, url)
+                self.web_stack.addWidget(QWidget())
+
+            # Views of pages that were removed from the settings
+            for view in old_views.values():
+                view.deleteLater()
+        finally:
+            self.setUpdatesEnabled(True)
+            self.updateGeometry()
 
         # Ensure the first page is selected initially
         if self.web_stack.count() > 0:
             self._switch_page(0)
 
-    def _rebuild_pages(self):
+        # The visible tab gets its cached icon right away, the rest are deferred
+        self._hydrate_icons()
+
+    def _hydrate_icons(self):
+        """Apply the cached icon of one pending tab button, then yield to the event loop."""
+        if not self._pending_icons:
+            return
+
+        button, url = self._pending_icons.pop(0)
+        cached_icon = FaviconCache.get(url)
+        if cached_icon is not None:
+            button.setIcon(cached_icon)
+
+        if self._pending_icons:
+            QTimer.singleShot(0, self._hydrate_icons)
+
+    def _rebuild_pages(self, settings: Mapping[str, Any]):
         """Rebuild pages when settings change."""
-        self.settings = KioskBrowserSettings.load_settings()
+        old_urls = self.settings["urls"]
+        self.settings = settings
         self.setWindowTitle(self.settings.get("windowBranding", "Kiosk Browser"))
         self.set_fullscreen(self.settings.get("fullscreen", True))
-        self.top_bar_widget.setVisible(self.settings.get("topbar", True))
-        self.top_bar_battery.setVisible(self.settings.get("topbar_battery", False))
-        self.top_bar_cpu.setVisible(self.settings.get("topbar_cpu", False))
-        self.top_bar_mem.setVisible(self.settings.get("topbar_mem", False))
-        self.pages_layout.setContentsMargins(
-            3, 0 if self.settings.get("topbar", True) else 3, 3, 0
-        )
+
+        topbar_on = self.settings.get("topbar", True)
+        self._twelve_hour = self.settings.get("topbar_12hr", True)
+        # Apply all top bar changes before the page is laid out and painted again
+        self.main_widget.setUpdatesEnabled(False)
+        try:
+            self.top_bar_widget.setVisible(topbar_on)
+            self.top_bar_battery.setVisible(self.settings.get("topbar_battery", False))
+            self.top_bar_cpu.setVisible(self.settings.get("topbar_cpu", False))
+            self.top_bar_mem.setVisible(self.settings.get("topbar_mem", False))
+            self.pages_layout.setContentsMargins(3, 0 if topbar_on else 3, 3, 0)
+            self._update_clock()
+        finally:
+            self.main_widget.setUpdatesEnabled(True)
+        self._update_topbar_timers()
+
+        # Recreating the tabs is only needed if the pages themselves changed
+        if self.settings["urls"] == old_urls:
+            return
+        if [url for url, *_ in self.settings["urls"]] == [url for url, *_ in old_urls]:
+            # Only labels were edited, rename the existing buttons in place
+            for button, (url, label, *_) in zip(self._tab_buttons, self.settings["urls"]):
+                button.setText(label)
+            return
         self._setup_pages()
 
-    def _update_button_icon(self, button: QPushButton, icon: QIcon, label: str):
+    def _update_button_icon(
+        self, button: QPushButton, icon: QIcon, url: str
+    ):
         """Update button icon when page icon changes."""
         if not icon.isNull():
             button.setIcon(icon)
-            logger.info(f"Fetched page icon for {label}")
+            FaviconCache.put(url, icon)
+            logger.info("Fetched page icon for {}", button.text())
 
     def _switch_page(self, index: int):
-        logger.debug(f"Switching to page {index}")
+        logger.debug("Switching to page {}", index)
+        if index in self._pending_pages:
+            self._create_page(index)
         self.web_stack.setCurrentIndex(index)
 
+    def _create_page(self, index: int):
+        """Replace the placeholder of a tab with its web view and start loading it."""
+        button, url = self._pending_pages.pop(index)
+
+        web_page = QWebEngineView()
+        page = QWebEnginePage(self.shared_profile, web_page)
+        web_page.setPage(page)
+        page.iconChanged.connect(
+            partial(self._update_button_icon, button, url=url)
+        )
+        page.load(QUrl(url))
+        self._view_by_url.setdefault(url, web_page)
+
+        placeholder = self.web_stack.widget(index)
+        self.web_stack.insertWidget(index, web_page)
+        self.web_stack.removeWidget(placeholder)
+        placeholder.deleteLater()
+
     def _setup_shortcuts(self):
         QShortcut(QKeySequence("Shift+F1"), self).activated.connect(self._show_settings)
 
-    def _apply_styling(self):
-        file = QFile(":/styles/style.qss")
-        if file.open(QIODevice.OpenModeFlag.ReadOnly | QIODevice.OpenModeFlag.Text):
-            self.setStyleSheet(bytes(file.readAll().data()).decode("utf-8"))
-            file.close()
-
     def _show_settings(self):
         logger.info("Opening settings window.")
         self.root_stack.setCurrentIndex(1)
 
     def changeEvent(self, event):
-        if self.settings.get("fullscreen", True):
-            if not self.isFullScreen():
-                self.showFullScreen()
+        # Activation and style changes also land here, only window state changes can leave fullscreen
+        if (
+            event.type() == QEvent.Type.WindowStateChange
+            and self.settings.get("fullscreen", True)
+            and not self.isFullScreen()
+        ):
+            self.showFullScreen()
+        super().changeEvent(event)
 
 
 if __name__ == "__main__":
+    # Log records are written from loguru's background thread instead of the GUI thread
+    logger.remove()
+    logger.add(sys.stderr, enqueue=True)
+
     settings = KioskBrowserSettings.load_settings()
     if settings.get("lockdown", False):
         logger.info("Applying lockdown settings.")
@@ -307,9 +546,16 @@ if __name__ == "__main__":
         else:
             logger.warning("Experimental Linux Wayland support enabled.")
 
+    # Tabs of the same site share a renderer process instead of one process per tab
+    chromium_flags = os.environ.get("QTWEBENGINE_CHROMIUM_FLAGS", "")
+    if "--process-per-site" not in chromium_flags:
+        os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = f"{chromium_flags} --process-per-site".strip()
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
 
     app = QApplication(sys.argv)
     qInitResources()
+    # Applied application-wide so every window and dialog shares one parsed stylesheet
+    app.setStyleSheet(_load_stylesheet())
 
     palette = QPalette()
     palette.setColor(QPalette.ColorRole.Text, QColor(255, 255, 255))
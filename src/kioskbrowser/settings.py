@@ -1,10 +1,24 @@
+import copy
+import json
+import queue
+from types import MappingProxyType
 from typing import Any
 
-from PySide6.QtCore import Signal, QSettings, QSize
+from PySide6.QtCore import (
+    Signal,
+    QSettings,
+    QSize,
+    QThread,
+    QCoreApplication,
+    QTimer,
+    QModelIndex,
+    QAbstractTableModel,
+    Qt,
+)
 from PySide6.QtWidgets import (
     QWidget,
     QLabel,
-    QTableWidget,
+    QTableView,
     QHeaderView,
     QAbstractItemView,
     QPushButton,
@@ -15,7 +29,6 @@ from PySide6.QtWidgets import (
     QSpinBox,
     QLineEdit,
     QHBoxLayout,
-    QTableWidgetItem,
     QDialog,
     QFileDialog,
 )
@@ -43,25 +56,135 @@ class KioskBrowserSettings:
         "lockdown_windows_hide_taskbar": False,
         "linux_wayland_experimental": False,
     }
+    # Value type of every setting, QSettings converts stored values to these
+    DEFAULT_TYPES = {key: type(value) for key, value in DEFAULT_SETTINGS.items()}
+    # Settings stored as a JSON string instead of a nested QVariant list
+    JSON_SETTINGS = {"urls"}
+
+    # QSettings store of the GUI thread, the writer thread keeps its own since QSettings is not thread-safe
+    _qsettings: QSettings | None = None
+    # In-memory copy of the last loaded/saved settings
+    _cache: dict[str, Any] | None = None
+    # Background thread persisting saved settings
+    _writer: "SettingsWriter | None" = None
 
     @classmethod
     def load_settings(cls) -> dict[str, Any]:
-        """Loads settings using QSettings and applies defaults for missing keys."""
-        settings = QSettings("meowmeowahr", "KioskBrowser")
-        loaded_settings = {
-            key: settings.value(key, default, type=type(default))
-            for key, default in cls.DEFAULT_SETTINGS.items()
+        """Loads settings using QSettings and applies defaults for missing keys.
+
+        Settings are only read from QSettings once, later calls return a copy of the cached values.
+        """
+        if cls._cache is None:
+            settings = cls._get_qsettings()
+            # Keys that were never saved use their default without a lookup
+            stored = set(settings.allKeys())
+            cls._cache = {
+                key: (
+                    cls._read(settings, key, default)
+                    if key in stored
+                    else copy.deepcopy(default)
+                )
+                for key, default in cls.DEFAULT_SETTINGS.items()
+            }
+            logger.debug("Settings loaded: {}", cls._cache)
+        return copy.deepcopy(cls._cache)
+
+    @classmethod
+    def save_settings(cls, settings: dict[str, Any]) -> set[str]:
+        """Saves the given settings, only writing values that changed.
+
+        Returns the keys that changed.
+
+        The in-memory cache is updated immediately, QSettings is written on a background thread.
+        """
+        if cls._cache is None:
+            cls.load_settings()
+
+        changed = {
+            key: value
+            for key, value in settings.items()
+            if cls._cache.get(key) != value
         }
-        logger.debug("Settings loaded: {}", loaded_settings)
-        return loaded_settings
+        if not changed:
+            logger.debug("Settings unchanged, nothing to save")
+            return set()
+
+        cls._cache.update(copy.deepcopy(changed))
+        cls._get_writer().write(
+            {
+                key: json.dumps(value) if key in cls.JSON_SETTINGS else value
+                for key, value in changed.items()
+            }
+        )
+        logger.info("Settings saved: {}", changed)
+        return set(changed)
+
+    @classmethod
+    def _read(cls, settings: QSettings, key: str, default: Any) -> Any:
+        if key not in cls.JSON_SETTINGS:
+            return settings.value(key, default, type=cls.DEFAULT_TYPES[key])
+
+        value = settings.value(key)
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except ValueError as e:
+                logger.warning("Failed to parse setting {}: {}", key, e)
+                return copy.deepcopy(default)
+        # Written by older versions as a plain list, converted to JSON on the next save
+        return settings.value(key, default, type=cls.DEFAULT_TYPES[key])
+
+    @classmethod
+    def flush(cls) -> None:
+        """Blocks until every saved value has been written to QSettings."""
+        if cls._writer is not None:
+            cls._writer.stop()
 
     @classmethod
-    def save_settings(cls, settings: dict[str, Any]) -> None:
-        """Saves the given settings using QSettings."""
+    def _get_qsettings(cls) -> QSettings:
+        if cls._qsettings is None:
+            cls._qsettings = QSettings("meowmeowahr", "KioskBrowser")
+        return cls._qsettings
+
+    @classmethod
+    def _get_writer(cls) -> "SettingsWriter":
+        # A flushed writer has finished, start a new one for later saves
+        if cls._writer is None or cls._writer.isFinished():
+            cls._writer = SettingsWriter()
+            cls._writer.start()
+            app = QCoreApplication.instance()
+            if app is not None:
+                app.aboutToQuit.connect(cls._writer.stop)
+        return cls._writer
+
+
+class SettingsWriter(QThread):
+    """Writes settings to QSettings off the GUI thread."""
+
+    def __init__(self):
+        super().__init__()
+        self._queue: queue.Queue[dict[str, Any] | None] = queue.Queue()
+
+    def write(self, values: dict[str, Any]) -> None:
+        """Queue values to be written."""
+        self._queue.put(copy.deepcopy(values))
+
+    def stop(self) -> None:
+        """Flush all queued values and wait for the thread to finish."""
+        if self.isRunning():
+            self._queue.put(None)
+            self.wait()
+
+    def run(self):
+        # Created here so it lives in this thread, one instance for every queued write
         qsettings = QSettings("meowmeowahr", "KioskBrowser")
-        for key, value in settings.items():
-            qsettings.setValue(key, value)
-        logger.info("Settings saved: {}", settings)
+        while (values := self._queue.get()) is not None:
+            for key, value in values.items():
+                qsettings.setValue(key, value)
+            # Only hit the disk once a burst of saves has been drained
+            if self._queue.empty():
+                qsettings.sync()
+        qsettings.sync()
 
 
 class LabeledSpinBox(QWidget):
@@ -81,6 +204,7 @@ class LabeledSpinBox(QWidget):
         # Set the layout to the widget
         self.setLayout(layout)
 
+        self.value = self.spin_box.value
         self.setValue = self.spin_box.setValue
         self.setRange = self.spin_box.setRange
         self.setSingleStep = self.spin_box.setSingleStep
@@ -92,8 +216,103 @@ class LabeledSpinBox(QWidget):
         self.label.setText(text)
 
 
+class UrlTableModel(QAbstractTableModel):
+    """Editable table of the configured urls, each row is a [url, label] list."""
+
+    # Column indexes double as the index into each row list
+    HEADERS = ("URL", "Label")
+    # Every cell has the same flags
+    FLAGS = (
+        Qt.ItemFlag.ItemIsEnabled
+        | Qt.ItemFlag.ItemIsSelectable
+        | Qt.ItemFlag.ItemIsEditable
+    )
+
+    def __init__(self, rows: list[list[str]], parent=None):
+        super().__init__(parent)
+        self._rows = rows
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if index.isValid() and role in (
+            Qt.ItemDataRole.DisplayRole,
+            Qt.ItemDataRole.EditRole,
+        ):
+            return self._rows[index.row()][index.column()]
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+        self._rows[index.row()][index.column()] = value
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def flags(self, index):
+        return self.FLAGS if index.isValid() else Qt.ItemFlag.NoItemFlags
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if (
+            role == Qt.ItemDataRole.DisplayRole
+            and orientation == Qt.Orientation.Horizontal
+        ):
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def rows(self) -> list[list[str]]:
+        """The rows of the table, not a copy."""
+        return self._rows
+
+    def append_row(self, url: str, label: str) -> None:
+        row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.append([url, label])
+        self.endInsertRows()
+
+    def remove_row(self, row: int) -> None:
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self.endRemoveRows()
+
+    def move_row(self, row: int, destination: int) -> bool:
+        """Move a row so it ends up before the row currently at destination."""
+        if not self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), destination):
+            return False
+        self._rows.insert(
+            destination - 1 if destination > row else destination,
+            self._rows.pop(row),
+        )
+        self.endMoveRows()
+        return True
+
+
 class SettingsPage(QWidget):
-    rebuild = Signal()
+    # Emits a read-only snapshot (MappingProxyType) of the saved settings
+    rebuild = Signal(object)
+
+    # Settings read back in save(): (settings key, widget attribute, getter)
+    _WIDGET_MAP = (
+        ("windowBranding", "window_branding_input", "text"),
+        ("fullscreen", "fullscreen_checkbox", "isChecked"),
+        ("topbar", "topbar_group", "isChecked"),
+        ("topbar_12hr", "topbar_12hr", "isChecked"),
+        ("topbar_battery", "topbar_battery", "isChecked"),
+        ("topbar_cpu", "topbar_cpu", "isChecked"),
+        ("topbar_mem", "topbar_mem", "isChecked"),
+        ("topbar_update_speed", "topbar_update", "value"),
+        ("lockdown", "lockdown_group", "isChecked"),
+        ("lockdown_always_on_top", "lockdown_always_on_top", "isChecked"),
+        ("linux_wayland_experimental", "linux_wayland_experimental", "isChecked"),
+    )
+    if platform.system() == "Windows":
+        _WIDGET_MAP += (
+            ("lockdown_windows_hide_taskbar", "lockdown_windows_hide_taskbar", "isChecked"),
+        )
 
     def __init__(self, parent=None):
         super().__init__()
@@ -103,10 +322,35 @@ class SettingsPage(QWidget):
 
         self.setWindowTitle("Settings")
 
+        # Coalesces saves in quick succession into a single write and page rebuild
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(250)
+        self._save_timer.timeout.connect(self._commit)
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self._flush)
+
+        # The widgets are only built the first time the page is shown
+        self._built = False
+
+    def showEvent(self, event):
+        if not self._built:
+            self._build_ui()
+            self._built = True
+        super().showEvent(event)
+
+    def _build_ui(self):
+        """Create the settings widgets from the current settings."""
         # URL Configuration Section
         self.url_label = QLabel("URL Config:")
-        self.url_table = QTableWidget(0, 2)  # 2 columns: URL, Label
-        self.url_table.setHorizontalHeaderLabels(["URL", "Label"])
+        self.url_model = UrlTableModel(
+            # *_ is kept for backward compatibility with >1.0.0
+            [[url, label] for url, label, *_ in self.settings["urls"]],
+            self,
+        )
+        self.url_table = QTableView()
+        self.url_table.setModel(self.url_model)
         self.url_table.horizontalHeader().setSectionResizeMode(
             QHeaderView.ResizeMode.Stretch
         )
@@ -114,7 +358,11 @@ class SettingsPage(QWidget):
             QAbstractItemView.SelectionBehavior.SelectItems
         )
         self.url_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
-        self._populate_url_table()
+        # Row height is set once on the header instead of for every row
+        self.url_table.verticalHeader().setSectionResizeMode(
+            QHeaderView.ResizeMode.Fixed
+        )
+        self.url_table.verticalHeader().setDefaultSectionSize(48)
 
         self.add_url_button = QPushButton("Add URL")
         self.add_url_button.setIcon(qta_icon("mdi6.plus"))
@@ -251,104 +499,75 @@ class SettingsPage(QWidget):
         right_layout.addStretch()
         right_layout.addWidget(self.save_button)
 
-    def _populate_url_table(self):
-        """Populate the URL table with current settings."""
-        self.url_table.setRowCount(0)
-        for url, label, *_ in self.settings["urls"]: # *_ is kept for backward compatibility with >1.0.0
-            row = self.url_table.rowCount()
-            self.url_table.insertRow(row)
-            self.url_table.setRowHeight(row, 48)
-            self.url_table.verticalHeader().setSectionResizeMode(
-                row, QHeaderView.ResizeMode.Fixed
-            )
-            self.url_table.setItem(row, 0, QTableWidgetItem(url))
-            self.url_table.setItem(row, 1, QTableWidgetItem(label))
-
     def _add_url(self):
         """Add a new URL entry."""
         dialog = URLConfigDialog(self.window)
         if dialog.exec():
             url, label = dialog.get_data()
-            row = self.url_table.rowCount()
-            self.url_table.insertRow(row)
-            self.url_table.setRowHeight(row, 48)
-            self.url_table.verticalHeader().setSectionResizeMode(
-                row, QHeaderView.ResizeMode.Fixed
-            )
-            self.url_table.setItem(row, 0, QTableWidgetItem(url))
-            self.url_table.setItem(row, 1, QTableWidgetItem(label))
+            self.url_model.append_row(url, label)
 
     def _remove_selected_urls(self):
         """Remove selected URLs from the table."""
-        selected_rows = set(item.row() for item in self.url_table.selectedItems())
+        selected_rows = {
+            index.row() for index in self.url_table.selectionModel().selectedIndexes()
+        }
         for row in sorted(selected_rows, reverse=True):
-            self.url_table.removeRow(row)
+            self.url_model.remove_row(row)
 
     def _move_up(self):
         """Move the selected row up."""
-        current_row = self.url_table.currentRow()
+        current_row = self.url_table.currentIndex().row()
 
         if current_row == -1:
             return
 
+        # The current cell and selection follow the moved row
         if current_row > 0:
-            self._swap_rows(current_row, current_row - 1)
-            self.url_table.selectRow(current_row - 1)
+            self.url_model.move_row(current_row, current_row - 1)
 
     def _move_down(self):
         """Move the selected row down."""
-        current_row = self.url_table.currentRow()
+        current_row = self.url_table.currentIndex().row()
 
         if current_row == -1:
             return
 
-        if current_row < self.url_table.rowCount() - 1:
-            self._swap_rows(current_row, current_row + 1)
-            self.url_table.selectRow(current_row + 1)
-
-    def _swap_rows(self, row1, row2):
-        """Swap two rows in the table."""
-        for col in range(self.url_table.columnCount()):
-            item1 = self.url_table.takeItem(row1, col)
-            item2 = self.url_table.takeItem(row2, col)
-            self.url_table.setItem(row1, col, item2)
-            self.url_table.setItem(row2, col, item1)
+        if current_row < self.url_model.rowCount() - 1:
+            self.url_model.move_row(current_row, current_row + 2)
 
     def save(self):
         """Save all settings, including the updated URL list."""
+        # Nothing can have been edited before the page was shown
+        if not self._built:
+            return
+
         # Update URL list
-        urls = []
-        for row in range(self.url_table.rowCount()):
-            url = self.url_table.item(row, 0).text()
-            label = self.url_table.item(row, 1).text()
-            urls.append([url, label, "@pageicon"])
-        self.settings["urls"] = urls
+        self.settings["urls"] = [
+            [url, label, "@pageicon"] for url, label in self.url_model.rows()
+        ]
 
         # Update other settings
-        self.settings["windowBranding"] = self.window_branding_input.text()
-        self.settings["fullscreen"] = self.fullscreen_checkbox.isChecked()
-        self.settings["topbar"] = self.topbar_group.isChecked()
-        self.settings["topbar_12hr"] = self.topbar_12hr.isChecked()
-        self.settings["topbar_battery"] = self.topbar_battery.isChecked()
-        self.settings["topbar_cpu"] = self.topbar_cpu.isChecked()
-        self.settings["topbar_mem"] = self.topbar_mem.isChecked()
-        self.settings["topbar_update_speed"] = self.topbar_update.spin_box.value()
-
-        # Update lockdown settings
-        self.settings["lockdown"] = self.lockdown_group.isChecked()
-        self.settings["lockdown_always_on_top"] = self.lockdown_always_on_top.isChecked()
-        if platform.system() == "Windows":
-            self.settings[
-                "lockdown_windows_hide_taskbar"
-            ] = self.lockdown_windows_hide_taskbar.isChecked()
+        for key, widget, getter in self._WIDGET_MAP:
+            self.settings[key] = getattr(getattr(self, widget), getter)()
+
+        # Persisting and rebuilding is deferred until saves stop coming in
+        self._save_timer.start()
 
-        self.settings["linux_wayland_experimental"] = self.linux_wayland_experimental.isChecked()
+    def _commit(self):
+        """Persist the pending settings and rebuild the pages."""
+        if not KioskBrowserSettings.save_settings(self.settings):
+            return
 
-        # Save settings
-        KioskBrowserSettings.save_settings(self.settings)
+        # Trigger page rebuild if callback is set. A shallow copy is enough, save() replaces
+        # the urls list instead of editing it and every other value is immutable.
+        self.rebuild.emit(MappingProxyType(dict(self.settings)))
 
-        # Trigger page rebuild if callback is set
-        self.rebuild.emit()
+    def _flush(self):
+        """Write out a still pending save before the application quits."""
+        if self._save_timer.isActive():
+            self._save_timer.stop()
+            KioskBrowserSettings.save_settings(self.settings)
+        KioskBrowserSettings.flush()
 
 
 class URLConfigDialog(QDialog):
@@ -378,15 +597,6 @@ class URLConfigDialog(QDialog):
         layout.addWidget(self.cancel_button, 2, 1)
         self.setLayout(layout)
 
-        self._apply_styling()
-
-    def _apply_styling(self):
-        try:
-            with open("style.qss", "r", encoding="utf-8") as f:
-                self.setStyleSheet(f.read())
-        except FileNotFoundError:
-            pass  # If style.qss is not found, skip applying styling
-
     def get_data(self):
         """Retrieve the entered data."""
         return self.url_input.text(), self.label_input.text()
@@ -1,87 +1,116 @@
-from datetime import datetime
+from functools import lru_cache
 from sys import maxsize
+from time import strftime
 
-from PySide6.QtGui import QIcon
+from PySide6.QtCore import QObject, QRunnable, Signal
+from PySide6.QtGui import QIcon, QPixmap
 from PySide6.QtWidgets import QWidget, QHBoxLayout, QLabel
 from psutil import sensors_battery, cpu_percent, virtual_memory
 
 from qtawesome import icon as qta_icon
+from loguru import logger
+
+# The interpreter's word size doesn't change at runtime
+_CPU_ICON = "mdi6.cpu-64-bit" if maxsize > 2**32 else "mdi6.cpu-32-bit"
 
 
 def get_time_string(twelve: bool = True):
-    dt = datetime.now()
-    return dt.strftime("%I:%M %p") if twelve else dt.strftime("%H:%M")
+    return strftime("%I:%M %p" if twelve else "%H:%M")
+
+
+@lru_cache(maxsize=64)
+def _icon(name: str, color: str | None = None) -> QIcon:
+    """qtawesome icon, rendered once per name and color for the whole session."""
+    return qta_icon(name, color=color) if color else qta_icon(name)
+
 
+def get_topbar_snapshot(battery: bool = True, cpu: bool = True, mem: bool = True) -> dict:
+    """Samples the requested stats in one pass: "battery" (psutil sbattery or None), "cpu" and "mem" percent."""
+    snapshot = {}
+    if battery:
+        snapshot["battery"] = sensors_battery()
+    if cpu:
+        snapshot["cpu"] = cpu_percent()
+    if mem:
+        snapshot["mem"] = virtual_memory().percent
+    return snapshot
 
-def get_battery():
-    battery = sensors_battery()
+
+def format_battery(battery):
     if not battery:
-        return qta_icon("mdi6.battery-off"), "??%"
+        return _icon("mdi6.battery-off"), "??%"
 
     percent = round(battery.percent)
     charging = battery.power_plugged
-
-    if percent > 90:
-        icon = qta_icon(
-            f"mdi6.battery{'-charging' if charging else ''}",
-            color="#4CAF50" if charging else "#FFFFFF",
-        )
-    elif percent > 80:
-        icon = qta_icon(
-            f"mdi6.battery{'-charging' if charging else ''}-90",
-            color="#4CAF50" if charging else "#FFFFFF",
-        )
-    elif percent > 70:
-        icon = qta_icon(
-            f"mdi6.battery{'-charging' if charging else ''}-80",
-            color="#4CAF50" if charging else "#FFFFFF",
-        )
-    elif percent > 60:
-        icon = qta_icon(
-            f"mdi6.battery{'-charging' if charging else ''}-70",
-            color="#4CAF50" if charging else "#FFFFFF",
-        )
-    elif percent > 50:
-        icon = qta_icon(
-            f"mdi6.battery{'-charging' if charging else ''}-60",
-            color="#4CAF50" if charging else "#FFFFFF",
+    charging_suffix = "-charging" if charging else ""
+
+    if percent <= 10:
+        icon = _icon("mdi6.battery-alert", color="#F44336")
+    elif percent <= 20:
+        icon = _icon(
+            f"mdi6.battery{charging_suffix}-20",
+            color="#4CAF50" if charging else "#F44336",
         )
-    elif percent > 40:
-        icon = qta_icon(
-            f"mdi6.battery{'-charging' if charging else ''}-50",
-            color="#4CAF50" if charging else "#FFFFFF",
-        )
-    elif percent > 30:
-        icon = qta_icon(
-            f"mdi6.battery{'-charging' if charging else ''}-40",
-            color="#4CAF50" if charging else "#FFFFFF",
-        )
-    elif percent > 20:
-        icon = qta_icon(
-            f"mdi6.battery{'-charging' if charging else ''}-30",
+    else:
+        # Icons come in steps of ten, rounded up: 21-30% is "-30", above 90% is the full battery
+        level = "" if percent > 90 else f"-{(percent + 9) // 10 * 10}"
+        icon = _icon(
+            f"mdi6.battery{charging_suffix}{level}",
             color="#4CAF50" if charging else "#FFFFFF",
         )
-    elif percent > 10 and not charging:
-        icon = qta_icon("mdi6.battery-20", color="#F44336")
-    elif percent > 10 and charging:
-        icon = qta_icon("mdi6.battery-charging-20", color="#4CAF50")
-    else:
-        icon = qta_icon("mdi6.battery-alert", color="#F44336")
 
     return icon, f"{percent}%"
 
 
-def get_cpu():
-    return qta_icon(
-        "mdi6.cpu-64-bit" if maxsize > 2**32 else "mdi6.cpu-32-bit"
-    ), f"{round(cpu_percent())}%"
+def format_cpu(percent: float):
+    return _icon(_CPU_ICON), f"{round(percent)}%"
+
+
+def format_mem(percent: float):
+    return _icon("mdi6.memory"), f"{round(percent)}%"
 
-def get_mem():
-    return qta_icon("mdi6.memory"), f"{round(virtual_memory().percent)}%"
+
+class TopBarStats(QObject):
+    """Delivers stats sampled by TopBarStatsWorker to the GUI thread."""
+
+    # Snapshot from get_topbar_snapshot, only sampled stats are included
+    sampled = Signal(dict)
+
+
+class TopBarStatsWorker(QRunnable):
+    """Samples system stats off the GUI thread, sysfs reads for the battery can block."""
+
+    def __init__(
+        self, stats: TopBarStats, battery: bool = True, cpu: bool = True, mem: bool = True
+    ):
+        super().__init__()
+        self.stats = stats
+        self.battery = battery
+        self.cpu = cpu
+        self.mem = mem
+
+    def run(self):
+        sample = {}
+        try:
+            sample = get_topbar_snapshot(battery=self.battery, cpu=self.cpu, mem=self.mem)
+        except Exception as e:
+            logger.error("Failed to sample top bar stats: {}", e)
+        finally:
+            # Always report back, the window waits for a sample before scheduling the next one
+            self.stats.sampled.emit(sample)
 
 
 class TopBarIconItem(QWidget):
     IconSize = (20, 20)
+    # Rendered pixmaps by QIcon.cacheKey(), there are only a few dozen distinct top bar icons
+    _pixmaps: dict[int, QPixmap] = {}
+
+    @classmethod
+    def _pixmap(cls, ico: QIcon) -> QPixmap:
+        pixmap = cls._pixmaps.get(ico.cacheKey())
+        if pixmap is None:
+            pixmap = cls._pixmaps[ico.cacheKey()] = ico.pixmap(*cls.IconSize)
+        return pixmap
 
     def __init__(self, ico: QIcon, text: str = ""):
         super().__init__()
@@ -91,7 +120,9 @@ class TopBarIconItem(QWidget):
         self.setLayout(layout)
 
         self.icon = QLabel()
-        self.icon.setPixmap(ico.pixmap(*self.IconSize))
+        self.icon.setPixmap(self._pixmap(ico))
+        # Icons are shared through _icon, the same icon doesn't need to be rendered again
+        self._current_icon = ico
 
         self.text = QLabel(text)
 
@@ -99,5 +130,8 @@ class TopBarIconItem(QWidget):
         layout.addWidget(self.text)
 
     def modify(self, ico: QIcon, text: str):
-        self.icon.setPixmap(ico.pixmap(*self.IconSize))
-        self.text.setText(text)
+        if ico is not self._current_icon:
+            self._current_icon = ico
+            self.icon.setPixmap(self._pixmap(ico))
+        if text != self.text.text():
+            self.text.setText(text)